@@ -1 +1,7 @@
-from .connect import search_compounds
+from .connect import (
+    close_pool,
+    close_pool_async,
+    from_binary,
+    search_compounds,
+    search_compounds_async,
+)
@@ -5,146 +5,443 @@ information, using a custom SQL expression.
 @author: Dr. Freddy A. Bernal
 """
 
+import asyncio
 import logging
 import os
 import re
+import sys
+import threading
 import warnings
-from functools import wraps
-from io import StringIO
-from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial, wraps
+from itertools import islice
+from typing import Iterable, Iterator
 
 import oracledb
 import pandas as pd
+import pyarrow as pa
 from dotenv import load_dotenv
+from joblib import Parallel, delayed
 from rdkit import Chem, rdBase
 from tqdm import tqdm
 
 # load keys
 load_dotenv()
 
+# fetch CLOBs (ct files) directly as str instead of LOB locators, avoiding one
+# extra round-trip per LOB to read its content
+oracledb.defaults.fetch_lobs = False
+
 # get access credentials
 DB_URL = os.getenv("DB_URL")
 USER = os.getenv("USERNAME")
 DB_KEY = os.getenv("DB_KEY")
 
+# Oracle limits IN lists to 1000 expressions
+MAX_IN_LIST = 1000
+
+# precompiled pattern to extract the selected fields from a SQL expression
+_FIELDS_RE = re.compile(r"SELECT\s+(.*?)\s+FROM", re.IGNORECASE | re.DOTALL)
+
+# connection pools shared by all queries (created on first use)
+_POOL = None
+_POOL_ASYNC = None
+# guards pool creation: the batch queries run on several threads and
+# create_pool releases the GIL during the initial connection handshake
+_POOL_LOCK = threading.Lock()
+
+
+def _connect_params() -> oracledb.ConnectParams:
+    """Connection parameters shared by the sync and async pools. The 64 KB session
+    data unit (vs the 8 KB thin-mode default) cuts the packet count for
+    ct-file-heavy responses; the server-side sqlnet.ora must allow a matching SDU
+    for the larger value to be negotiated.
+    """
+    return oracledb.ConnectParams(
+        user=USER,
+        password=DB_KEY,
+        sdu=65535,
+        tcp_connect_timeout=5,
+    )
+
+
+def _get_pool() -> oracledb.ConnectionPool:
+    """Return the shared connection pool, creating it on first call. Pooling avoids
+    paying the TCP + TLS + authentication handshake on every query.
+    """
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = oracledb.create_pool(
+                    dsn=DB_URL,
+                    params=_connect_params(),
+                    min=1,
+                    max=4,
+                    increment=1,
+                    stmtcachesize=50,
+                )
+    return _POOL
+
+
+def close_pool():
+    """Close the shared connection pool for clean shutdown. A new pool is created
+    automatically if further queries follow.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.close()
+
+
+def _get_pool_async() -> "oracledb.AsyncConnectionPool":
+    """Return the shared async connection pool, creating it on first call."""
+    global _POOL_ASYNC
+    if _POOL_ASYNC is None:
+        with _POOL_LOCK:
+            if _POOL_ASYNC is None:
+                _POOL_ASYNC = oracledb.create_pool_async(
+                    dsn=DB_URL,
+                    params=_connect_params(),
+                    min=1,
+                    max=4,
+                    increment=1,
+                    stmtcachesize=50,
+                )
+    return _POOL_ASYNC
+
+
+async def close_pool_async():
+    """Close the shared async connection pool for clean shutdown. A new pool is
+    created automatically if further queries follow.
+    """
+    global _POOL_ASYNC
+    with _POOL_LOCK:
+        pool, _POOL_ASYNC = _POOL_ASYNC, None
+    if pool is not None:
+        await pool.close()
+
+
+def connect(arraysize: int = 1000, prefetchrows: int = None):
+    """Decorator to acquire a secure connection to the COMAS database from the shared
+    pool allowing subsequent query. The connection is returned to the pool after
+    function execution.
 
-def connect(func):
-    """Decorator to open a secure connection to the COMAS database allowing subsequent
-    query. The connection is effectively closed after function execution.
+    Args:
+        arraysize (int, optional): rows fetched per internal round-trip. Defaults
+            to 1000 to amortize fetch round-trips for batched queries.
+        prefetchrows (int, optional): rows prefetched on execute. Defaults to
+            arraysize + 1 (oracledb convention).
     """
+    if prefetchrows is None:
+        prefetchrows = arraysize + 1
 
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        connection = oracledb.connect(user=USER, password=DB_KEY, dsn=DB_URL)
-        cursor = connection.cursor()
-        try:
-            result = func(cursor, *args, **kwargs)
-            return result
-        finally:
-            connection.close()
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _get_pool().acquire() as connection:
+                cursor = connection.cursor()
+                cursor.arraysize = arraysize
+                cursor.prefetchrows = prefetchrows
+                result = func(cursor, *args, **kwargs)
+                return result
 
-    return wrapper
+        return wrapper
 
+    return decorator
 
-@connect
-def search_compounds(cursor, identifiers: Iterable[str], sql: str) -> pd.DataFrame:
-    """Utility for compound search on the COMAS DB.
+
+def search_compounds(identifiers: Iterable[str], sql: str) -> pd.DataFrame:
+    """Utility for compound search on the COMAS DB. The identifiers are bound in
+    batches of up to 1000 per query (Oracle's IN-list limit), so N compounds take
+    only ceil(N / 1000) round-trips instead of N, and the batches are queried
+    concurrently on threads, each with its own pooled connection (oracledb
+    releases the GIL during network I/O). The SQL expression must contain an IN
+    clause with the placeholder :mybv (e.g. 'WHERE MOL_REGID IN (:mybv)').
+
+    Args:
+        identifiers (Iterable[str]): any compound identifier (e.g. Compound ID)
+        sql (str): SQL expression to effectively query DB.
+
+    Returns:
+        pd.DataFrame: results from query.
+    """
+    chunks = list(chunked(as_list(identifiers), MAX_IN_LIST))
+    # one worker per pooled connection; executor.map preserves chunk order
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        fetched = list(
+            tqdm(
+                executor.map(partial(_fetch_chunk, sql), chunks),
+                total=len(chunks),
+                desc="Processed",
+                disable=not sys.stderr.isatty(),
+            )
+        )
+
+    columns = {name: [] for name in get_field_names(sql)}
+    for chunk, res in zip(chunks, fetched):
+        if res:
+            append_rows(columns, res)
+        warn_missing(chunk, res)
+
+    result = organize_results(columns)
+    return result
+
+
+@connect()
+def _fetch_chunk(cursor, sql: str, chunk: list) -> list:
+    """Fetch all rows for one identifier batch on its own pooled connection.
 
     Args:
         cursor (oracledb.cursor): oracle connection inherited from @connect.
+        sql (str): SQL expression to effectively query DB.
+        chunk (list): batch of at most MAX_IN_LIST identifiers.
+
+    Returns:
+        list: rows fetched for the batch.
+    """
+    # Bind the whole chunk as an IN list (:b0,:b1,...)
+    in_clause = ",".join(f":b{i}" for i in range(len(chunk)))
+    binds = {f"b{i}": value for i, value in enumerate(chunk)}
+    # Execute SQL
+    cursor.execute(sql.replace(":mybv", in_clause), binds)
+    # Stream result from search in arraysize batches to bound client memory
+    rows = []
+    while res := cursor.fetchmany(cursor.arraysize):
+        rows.extend(res)
+    return rows
+
+
+async def search_compounds_async(
+    identifiers: Iterable[str], sql: str, max_concurrency: int = 4
+) -> pd.DataFrame:
+    """Async variant of search_compounds. The identifier batches are queried
+    concurrently on connections from the shared async pool, overlapping their
+    network round-trips instead of waiting one full round-trip per batch.
+
+    Args:
         identifiers (Iterable[str]): any compound identifier (e.g. Compound ID)
         sql (str): SQL expression to effectively query DB.
+        max_concurrency (int, optional): maximum number of batches in flight at
+            once. Defaults to 4 (the pool size).
 
     Returns:
         pd.DataFrame: results from query.
     """
-    result = []
-    for id in tqdm(identifiers, desc="Processed"):
-        # Execute SQL
-        cursor.execute(sql, mybv=id)
-        # Fetch result from search
-        res = cursor.fetchall()
+    pool = _get_pool_async()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_chunk(chunk: list) -> list:
+        async with semaphore:
+            async with pool.acquire() as connection:
+                cursor = connection.cursor()
+                cursor.arraysize = 1000
+                cursor.prefetchrows = 1001
+                in_clause = ",".join(f":b{i}" for i in range(len(chunk)))
+                binds = {f"b{i}": value for i, value in enumerate(chunk)}
+                await cursor.execute(sql.replace(":mybv", in_clause), binds)
+                return await cursor.fetchall()
+
+    chunks = list(chunked(as_list(identifiers), MAX_IN_LIST))
+    fetched = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+    columns = {name: [] for name in get_field_names(sql)}
+    for chunk, res in zip(chunks, fetched):
         if res:
-            # Transform structural info into str (otherwise are kept as Oracle objects)
-            converted = first_output_to_str(res)  # before closing connection
-            result.append(converted)
-        else:
-            warnings.warn("No result fetched from identifier: " + id)
+            append_rows(columns, res)
+        warn_missing(chunk, res)
 
-    result = organize_results(result, sql)
+    result = organize_results(columns)
     return result
 
 
-def first_output_to_str(data: tuple) -> tuple:
-    """Convert CT file from an embedded orable object into a string.
+def as_list(identifiers: Iterable) -> list:
+    """Materialize identifiers as a plain list. For a pandas Series .tolist()
+    converts in C, avoiding the slow elementwise __iter__ through the block
+    manager.
 
     Args:
-        data (tuple): collection of properties retrieved from DB.
+        identifiers (Iterable): any collection of compound identifiers.
 
     Returns:
-        tuple: collection of properties retrieved from DB as str.
+        list: identifiers as a plain list.
     """
-    # we take only the first entry (one container ID)
-    first = data[0]
-    # Transform structural info into str
-    converted = first[:-1] + tuple([str(first[-1])])
+    if hasattr(identifiers, "tolist"):
+        return identifiers.tolist()
+    return list(identifiers)
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Split an iterable into consecutive lists of at most the given size.
+
+    Args:
+        iterable (Iterable): collection to split.
+        size (int): maximum number of items per chunk.
 
-    return converted
+    Yields:
+        list: consecutive chunks of the given size.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
-def organize_results(data: list, sql: str) -> pd.DataFrame:
-    """Transforms query results from list to dataframe. It automatically assigns column
-    names using the corresponding DB fields and adds RDKit.Mol objects and warnings
-    catched during ct to mol transformation.
+def warn_missing(chunk: list, rows: list):
+    """Warn for every identifier of a batch that matched no row. The bound column
+    is not known here, so an identifier counts as found if its string form
+    appears anywhere in the fetched rows.
 
     Args:
-        data (list): information from query.
-        sql (str): SQL expression used for query.
+        chunk (list): batch of identifiers bound into the query.
+        rows (list): rows fetched for the batch.
+    """
+    fetched = {str(value) for row in rows for value in row}
+    for identifier in chunk:
+        if str(identifier) not in fetched:
+            warnings.warn("No result fetched from identifier: " + str(identifier))
+
+
+def append_rows(columns: dict, rows: list):
+    """Append fetched rows to their per-field columnar lists. Keeping the data
+    columnar from the start avoids materializing a list of row tuples that pandas
+    would only have to transpose again. The rows are transposed in one zip call
+    and extended columnwise, so no per-row tuples are rebuilt in Python. With
+    fetch_lobs disabled the ct files already arrive as str, so no per-value
+    conversion is needed.
+
+    Args:
+        columns (dict): per-field lists keyed by DB field name.
+        rows (list): rows fetched from the DB.
+    """
+    for values, fetched in zip(columns.values(), zip(*rows)):
+        values.extend(fetched)
+
+
+def organize_results(columns: dict) -> pd.DataFrame:
+    """Transforms columnar query results into a dataframe with RDKit.Mol objects and
+    warnings catched during ct to mol transformation. The ct file strings are
+    consumed during the transformation instead of being carried along as a
+    redundant MOL_CTFILE column. The scalar fields are assembled through a pyarrow
+    Table, which converts the columns in C and backs the dataframe with arrow
+    arrays instead of NumPy object arrays.
+
+    Args:
+        columns (dict): per-field lists keyed by DB field name.
 
     Returns:
         pd.DataFrame: results including rdkit mol object and possible warnings.
     """
-    cols = get_field_names(sql)
-    result = pd.DataFrame(data, columns=cols)
-    if "MOL_CTFILE" in cols:
-        # result["ROMol"] = result["MOL_CTFILE"].apply(Chem.MolFromMolBlock)
-        mols, messages = transform_ct(result["MOL_CTFILE"])
+    ct_strs = columns.pop("MOL_CTFILE", None)
+    result = pa.table(columns).to_pandas(types_mapper=pd.ArrowDtype)
+    if ct_strs is not None:
+        mols, binaries, messages = transform_ct(ct_strs)
         result["ROMol"] = mols
+        # compact binary siblings, so serialized frames restore their molecules
+        # with from_binary instead of re-parsing ct files
+        result["ROMol_pkl"] = binaries
         result["Warnings"] = messages
-        result.drop(columns="MOL_CTFILE", inplace=True)
     return result
 
 
-def get_field_names(sql: str) -> list:
-    """Extract DB field names from SQL expression.
+def from_binary(df: pd.DataFrame) -> pd.DataFrame:
+    """Restore the ROMol column of a reloaded results dataframe from its ROMol_pkl
+    binary column. Rebuilding molecules with Chem.Mol is roughly an order of
+    magnitude faster than re-parsing ct file strings.
+
+    Args:
+        df (pd.DataFrame): results dataframe containing a ROMol_pkl column.
+
+    Returns:
+        pd.DataFrame: the same dataframe with the ROMol column restored.
+    """
+    df["ROMol"] = [
+        Chem.Mol(binary) if binary is not None else None for binary in df["ROMol_pkl"]
+    ]
+    return df
+
+
+@lru_cache(maxsize=32)
+def get_field_names(sql: str) -> tuple:
+    """Extract DB field names from SQL expression. Pipelines typically reuse the
+    same SQL literal across calls, so the results are memoized.
 
     Args:
         sql (str): SQL expression for query
 
     Returns:
-        list: field names
-    """
-    # remove line spaces for re to work
-    sql_no_blank = sql.replace("\n", "")
-    # search fields
-    match = re.findall("SELECT(.*?)FROM", sql_no_blank)
-    # split fields
-    fields = match[0].split(",")
-    # retrieve actual field name
-    fields = [x.split(".")[-1] for x in fields]
+        tuple: field names
+    """
+    # search fields (DOTALL makes newline removal unnecessary)
+    match = _FIELDS_RE.search(sql)
+    # split fields and retrieve actual field names
+    fields = tuple(x.rsplit(".", 1)[-1].strip() for x in match.group(1).split(","))
     return fields
 
 
 def transform_ct(ct_strs: Iterable[str]) -> tuple[list]:
     """Convert ct file content into RDKit mol objects while catching warning messages.
+    Parsing runs in C++ and is CPU-bound, so the files are distributed over all cores
+    with joblib's loky backend; molecules cross the process boundary as compact
+    binary blobs and are rebuilt in the parent. RDKit's MultithreadedSDMolSupplier
+    was considered as a lighter alternative but yields molecules in completion
+    order and funnels all threads into one logger, which would break the row
+    alignment and the per-molecule warning attribution relied on here.
+
+    Args:
+        ct_strs (Iterable[str]): group of chemical table files as strings.
+
+    Duplicate ct files (batch repeats, isomer re-registrations) are parsed only
+    once and the cached result fanned back out to every occurrence.
+
+    Returns:
+        tuple: RDKit Mol objects, their binary serializations (as produced by
+            Mol.ToBinary, already available from the workers) and RDKit warnings
+            as lists.
+    """
+    ct_strs = list(ct_strs)
+    unique = list(dict.fromkeys(ct_strs))
+    parsed = Parallel(n_jobs=-1, backend="loky")(
+        delayed(_parse_one)(ct) for ct in unique
+    )
+    cache = dict(zip(unique, parsed))
+
+    res_mols = []
+    binaries = []
+    messages = []
+    for ct in ct_strs:
+        binary, text = cache[ct]
+        # every occurrence gets its own Mol rebuilt from the cached binary
+        res_mols.append(Chem.Mol(binary) if binary is not None else None)
+        binaries.append(binary)
+        messages.append(text)
+    return res_mols, binaries, messages
+
+
+class _ListHandler(logging.Handler):
+    """Logging handler collecting the emitted messages in a plain list. Cheaper than
+    the StringIO + truncate/seek dance and easy to reset between molecules.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.buf = []
+
+    def emit(self, record):
+        self.buf.append(record.getMessage())
+
+
+def _parse_one(ct: str) -> tuple:
+    """Parse a single ct file while catching warning messages inside a worker.
     First transfer logger information from C++ to python as shown in:
     https://greglandrum.github.io/rdkit-blog/posts/2024-02-23-custom-transformations-and-logging.html
 
     Args:
-        ct_strs (Iterable[str]): group of chemical table files as strings.
+        ct (str): chemical table file as string.
 
     Returns:
-        tuple: RDKit Mol objects and RDKit warnings as lists.
+        tuple: molecule serialized with Mol.ToBinary (or None) and RDKit
+            warnings as str.
     """
     # Tell the RDKit's C++ backend to log to use the python logger:
     rdBase.LogToPythonLogger()
@@ -153,25 +450,27 @@ def transform_ct(ct_strs: Iterable[str]) -> tuple[list]:
     # to the console/notebook):
     logger.handlers[0].setLevel(logging.WARN)
 
-    # create a handler that uses the StringIO and set its log level:
-    logger_sio = StringIO()
-    handler = logging.StreamHandler(logger_sio)
-    handler.setLevel(logging.INFO)
-    # add the handler to the Python logger:
+    # collect the messages for this molecule in a list:
+    handler = _ListHandler()
     logger.addHandler(handler)
-
-    # Iterate over files
-    res_mols = []
-    messages = []
-    for ct in ct_strs:
-        mol = Chem.MolFromMolBlock(ct)
-        res_mols.append(mol)
-
-        text = logger_sio.getvalue()
-        messages.append(text)
-
-        # reset StringIO object
-        logger_sio.truncate(0)
-        logger_sio.seek(0)
-
-    return res_mols, messages
+    try:
+        # fast parse without sanitization; the expensive aromaticity/valence
+        # checks run separately so malformed blocks fail cheaply
+        mol = Chem.MolFromMolBlock(ct, sanitize=False, removeHs=False)
+        if mol is not None:
+            try:
+                Chem.SanitizeMol(mol)
+                # match the default MolFromMolBlock output: drop explicit Hs
+                mol = Chem.RemoveHs(mol)
+            except Exception as e:
+                # the rdkit logger normally captured the error text already;
+                # only record it when it did not
+                if all(str(e) not in msg for msg in handler.buf):
+                    handler.buf.append(str(e))
+                mol = None
+        text = "\n".join(handler.buf)
+    finally:
+        logger.removeHandler(handler)
+
+    binary = mol.ToBinary() if mol is not None else None
+    return binary, text
@@ -0,0 +1,81 @@
+"""
+Offline test of the transform_ct function on sample ct files. Runs without
+database access or credentials.
+
+@author: Dr. Freddy A. Bernal
+"""
+
+from rdkit import Chem
+
+from database_access.connect import transform_ct
+
+# ethanol as a V2000 ct file
+ETHANOL = """
+     RDKit          2D
+
+  3  2  0  0  0  0  0  0  0  0999 V2000
+    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    1.2990    0.7500    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    2.5981   -0.0000    0.0000 O   0  0  0  0  0  0  0  0  0  0  0  0
+  1  2  1  0
+  2  3  1  0
+M  END
+"""
+
+# pentavalent carbon to trigger a sanitization error
+BROKEN = """
+     RDKit          2D
+
+  6  5  0  0  0  0  0  0  0  0999 V2000
+    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    1.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    2.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    3.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    4.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    5.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+  1  2  1  0
+  1  3  1  0
+  1  4  1  0
+  1  5  1  0
+  1  6  1  0
+M  END
+"""
+
+# methanol with explicit hydrogens as a V2000 ct file
+METHANOL_H = """
+     RDKit          2D
+
+  6  5  0  0  0  0  0  0  0  0999 V2000
+    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+    1.5000    0.0000    0.0000 O   0  0  0  0  0  0  0  0  0  0  0  0
+   -1.5000    0.0000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+    0.0000    1.5000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.0000   -1.5000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+    2.2500   -1.2990    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+  1  2  1  0
+  1  3  1  0
+  1  4  1  0
+  1  5  1  0
+  2  6  1  0
+M  END
+"""
+
+# duplicate ethanol exercises the parse cache fan-out
+mols, binaries, messages = transform_ct([ETHANOL, ETHANOL, BROKEN, METHANOL_H])
+print(f"Parsed molecules: {mols}")
+print(f"Messages: {messages}")
+
+assert mols[0] is not None and mols[0].GetNumAtoms() == 3
+assert Chem.MolToSmiles(mols[0]) == "CCO"
+assert mols[1] is not None and mols[1] is not mols[0]
+assert mols[2] is None
+assert Chem.MolToSmiles(Chem.Mol(binaries[0])) == "CCO"
+assert binaries[2] is None
+assert messages[0] == "" and messages[1] == ""
+assert messages[2] != ""
+# each warning is recorded once
+assert messages[2].count("Explicit valence") == 1
+# explicit hydrogens are removed as with a plain MolFromMolBlock
+assert mols[3] is not None and mols[3].GetNumAtoms() == 2
+assert Chem.MolToSmiles(mols[3]) == "CO"
+print("transform_ct OK")
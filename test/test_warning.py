@@ -14,7 +14,7 @@ QUATTRO_CR.MOLECULE.MOL_REGID,QUATTRO_CR.MOLECULE.MOL_CTFILE
 FROM CM.CM_UNITS,QUATTRO_CR.BATCH,QUATTRO_CR.MOLECULE
 WHERE CM.CM_UNITS.CMA_ID = QUATTRO_CR.BATCH.BATCH_ID
 AND QUATTRO_CR.BATCH.MOL_COMP_ID = QUATTRO_CR.MOLECULE.MOL_COMP_ID
-AND QUATTRO_CR.MOLECULE.MOL_REGID = :mybv"""
+AND QUATTRO_CR.MOLECULE.MOL_REGID IN (:mybv)"""
 
 path = os.path.abspath(os.getcwd())
 # get list of compounds